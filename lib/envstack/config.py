@@ -64,7 +64,7 @@ HOME = os.getenv("HOME")
 IGNORE_MISSING = bool(os.getenv("IGNORE_MISSING", 1))
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
 ON_POSIX = "posix" in sys.builtin_module_names
-PLATFORM = platform.system().lower()
+PLATFORM = sys.intern(platform.system().lower())
 PYTHON_VERSION = sys.version_info[0]
 SHELL = detect_shell()
 USERNAME = os.getenv("USERNAME", os.getenv("USER"))
@@ -33,10 +33,12 @@ __doc__ = """
 Contains functions and classes for processing scoped .env files.
 """
 
+import functools
 import os
 import re
 import string
 from pathlib import Path
+from types import MappingProxyType
 
 from envstack import config, logger, path, util
 from envstack.exceptions import *
@@ -44,9 +46,12 @@ from envstack.exceptions import *
 # value delimiter pattern (splits values by os.pathsep)
 delimiter_pattern = re.compile("(?![^{]*})[;:]+")
 
-# stores cached file data in memory
+# stores cached file data in memory, keyed on path
 load_file_cache = {}
 
+# shared read-only default for lookups in .env files without a platform section
+empty_data = MappingProxyType({})
+
 # stores environment when calling envstack.save()
 saved_environ = None
 
@@ -168,6 +173,10 @@ class EnvVar(string.Template, str):
         :env: Env instance object or key/value dict.
         :returns: expanded EnvVar instance.
         """
+        # nothing to substitute in literal strings
+        if type(self.template) is str and "$" not in self.template:
+            return EnvVar(self.template)
+
         try:
             val = EnvVar(self.safe_substitute(env))
         except RuntimeError as err:
@@ -215,7 +224,7 @@ class EnvVar(string.Template, str):
                 str,
                 bytes,
             ):
-                return delimiter_pattern.split(self.template)
+                return list(_split_parts(self.template))
             return self.template
         return []
 
@@ -230,8 +239,20 @@ class EnvVar(string.Template, str):
         >>> v.vars()
         ['FOO', 'BAR']
         """
-        matches = super(EnvVar, self).pattern.findall(str(self.template))
-        return [key for match in matches for key in match if key]
+        return list(_find_vars(str(self.template)))
+
+
+@functools.lru_cache(maxsize=1024)
+def _split_parts(template):
+    """Returns a tuple of delimited parts of a template string (cached)."""
+    return tuple(delimiter_pattern.split(template))
+
+
+@functools.lru_cache(maxsize=1024)
+def _find_vars(template: str):
+    """Returns a tuple of named variables in a template string (cached)."""
+    matches = EnvVar.pattern.findall(template)
+    return tuple(key for match in matches for key in match if key)
 
 
 class Env(dict):
@@ -290,6 +311,12 @@ def clear_file_cache():
     load_file_cache = {}
 
 
+def clear_seen_stacks():
+    """Clears global set of stack names seen when getting sources."""
+    global seen_stacks
+    seen_stacks = set()
+
+
 def get_sources(
     *names,
     scope: str = None,
@@ -306,9 +333,6 @@ def get_sources(
     :raises TemplateNotFound: if a file is not found in ENVPATH or scope.
     :returns: list of Source objects for the given stack names.
     """
-    # TODO: smarter file caching (issue #26)
-    # clear_file_cache()
-
     # set default scope to the current working directory
     scope = Path(scope or os.getcwd()).resolve()
 
@@ -538,7 +562,7 @@ def save():
     global saved_environ
 
     if not saved_environ:
-        saved_environ = dict(os.environ.copy())
+        saved_environ = dict(os.environ)
         return saved_environ
 
 
@@ -553,29 +577,39 @@ def revert():
     Revert to the previous environment:
 
         >>> envstack.revert()
+        ['DEPLOY_ROOT', 'ENV', 'PATH', ...]
+
+    :returns: list of restored (removed or reset) variable names.
     """
     global saved_environ
-    global seen_stacks
 
     # clear the seen stacks
-    seen_stacks = set()
+    clear_seen_stacks()
 
     # nothing to revert to
     if saved_environ is None:
-        return
+        return []
 
     # clear current sys.path values
     util.clear_sys_path()
 
-    # restore the original environment
-    os.environ.clear()
-    os.environ.update(saved_environ)
+    # restore the original environment, only touching keys that differ
+    restored = []
+    for key in os.environ.keys() - saved_environ.keys():
+        del os.environ[key]
+        restored.append(key)
+    for key, value in saved_environ.items():
+        if os.environ.get(key) != value:
+            os.environ[key] = value
+            restored.append(key)
 
     # restore sys.path from PYTHONPATH
     util.load_sys_path()
 
     saved_environ = None
 
+    return sorted(restored)
+
 
 def init(*name, ignore_missing: bool = config.IGNORE_MISSING):
     """Initializes the environment from a given stack namespace. Environments
@@ -625,8 +659,12 @@ def resolve_environ(env: dict):
     """
     resolved = Env()
 
+    # evaluated expressions, shared so that variables referenced by several
+    # keys are only expanded once
+    memo = {}
+
     for key, value in env.items():
-        evaluated_value = util.evaluate_modifiers(value, env)
+        evaluated_value = util.evaluate_modifiers(value, env, memo)
         resolved[key] = evaluated_value
 
     return resolved
@@ -664,8 +702,8 @@ def load_environ(
     if not name:
         name = [config.DEFAULT_NAMESPACE]
 
-    # TODO: do we need to add a revert here?
-    #revert()
+    # stacks seen by previous calls must not affect includes
+    clear_seen_stacks()
 
     # create the environment to be returned
     env = Env()
@@ -713,15 +751,19 @@ def load_file(path: str):
     """
     global load_file_cache
 
-    if path in load_file_cache:
-        return load_file_cache[path]
-
-    if not os.path.exists(path):
+    try:
+        st = os.stat(path)
+    except OSError:
         return {}
 
-    else:
-        data = util.validate_yaml(path)
-        load_file_cache[path] = data
+    # cached data is valid while the file mtime and size are unchanged
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = load_file_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    data = util.validate_yaml(path)
+    load_file_cache[path] = (stamp, data)
 
     return data
 
@@ -735,13 +777,14 @@ def trace_var(*name, var: str = None, scope: str = None):
     :returns: source path.
     """
     # get the sources for the given stack(s)
+    clear_seen_stacks()
     sources = get_sources(*name, scope=scope, ignore_missing=True)
     sources.reverse()
 
     # check for the variable in the env files
     for source in sources:
         data = load_file(source.path)
-        env = data.get(config.PLATFORM, data.get("all", {}))
+        env = data.get(config.PLATFORM, data.get("all", empty_data))
         if var in env:
             return source.path
         elif os.getenv(var):
@@ -33,8 +33,11 @@ __doc__ = """
 Contains pathing classes and functions.
 """
 
+import functools
 import os
 import re
+import sys
+from types import MappingProxyType
 
 from envstack import config, logger
 from envstack.exceptions import *
@@ -58,6 +61,65 @@ TEMPLATES_ENV_NAME = "templates"
 TEMPLATES_ENV_ROOT = "ROOT"
 
 
+@functools.lru_cache(maxsize=256)
+def compile_template(path_format):
+    """Compiles a template path format into a field extraction regex.
+    Results are cached by path format, so repeated Template instances
+    built from the same format share the compiled regex.
+
+    :param path_format: template path format
+    :returns: tuple of (compiled regex, tuple of keywords)
+    """
+    # conform template slashes
+    path_format = path_format.replace("\\", "/")
+
+    # field names are a small closed set shared by every fields dict, so
+    # intern them once here rather than per extracted path
+    tokens = keyword_re.split(path_format)
+    keywords = tuple(map(sys.intern, tokens[1::2]))
+
+    tokens[1::2] = map("(?P<{}>[^,;\/]*)".format, keywords)
+    tokens[0::2] = map(re.escape, tokens[0::2])
+
+    # look for back references
+    for i in range(len(tokens)):
+        fm = field_re.match(tokens[i])
+        if fm is not None:
+            name = fm.group(1)
+            back_ref = "(?P={name})".format(name=name)
+            try:
+                while True:
+                    index = tokens[i + 1 :].index(tokens[i])
+                    tokens[i + 1 + index] = back_ref
+            except ValueError:
+                pass
+
+    return re.compile("".join(tokens)), keywords
+
+
+@functools.lru_cache(maxsize=256)
+def parse_formats(path_format):
+    """Parses a template path format into a map of keywords to value
+    classes, e.g. {version:03d} maps 'version' to int. Results are cached
+    by path format and returned read-only.
+
+    :param path_format: template path format
+    :returns: read-only dict of keywords to value classes
+    """
+    tokens = formats_re.split(path_format)
+    results = {}
+    for key in dict.fromkeys(tokens[1::2]):
+        _type = str
+        if ":" in key:
+            key, f = key.split(":")
+            if "d" in f:
+                _type = int
+            elif "f" in f:
+                _type = float
+        results[key] = _type
+    return MappingProxyType(results)
+
+
 class Path(str):
     """Subclass of `str` with some platform agnostic pathing support.
 
@@ -144,6 +206,8 @@ class Template(object):
         '/show/foo/pub/bar/v003'
     """
 
+    __slots__ = ("path_format",)
+
     def __init__(self, path):
         assert path, "Template path format cannot be empty"
         self.path_format = str(path)
@@ -154,14 +218,6 @@ class Template(object):
     def __str__(self):
         return self.path_format
 
-    def _parse(self, pattern):
-        tokens = pattern.split(self.path_format)
-        keys = []
-        for token in tokens[1::2]:
-            if token not in keys:
-                keys.append(token)
-        return keys
-
     def apply_fields(self, **fields):
         """
         Applies key/value pairs matching template format.
@@ -170,7 +226,7 @@ class Template(object):
         :returns: resolved path as string
         :raises: MissingFieldError
         """
-        formats = self.get_formats()
+        formats = parse_formats(self.path_format)
 
         def cast(k, v):
             fmt = formats.get(k, str)
@@ -190,22 +246,12 @@ class Template(object):
 
     def get_keywords(self):
         """Returns a list of required keywords."""
-        return self._parse(keyword_re)
+        _, keywords = compile_template(self.path_format)
+        return list(dict.fromkeys(keywords))
 
     def get_formats(self):
         """Returns a map of keywords to value classes."""
-        matches = self._parse(formats_re)
-        results = {}
-        for key in matches:
-            _type = str
-            if ":" in key:
-                key, f = key.split(":")
-                if "d" in f:
-                    _type = int
-                elif "f" in f:
-                    _type = float
-            results[key] = _type
-        return results
+        return dict(parse_formats(self.path_format))
 
     def get_fields(self, path):
         """Gets key/value pairs from path that map to template path.
@@ -213,31 +259,10 @@ class Template(object):
         :param path: file system path as string
         :returns: dict of key/value pairs
         """
-        # conform path and template slashes
+        # conform path slashes to match the compiled template
         path = path.replace("\\", "/")
-        path_format = self.path_format.replace("\\", "/")
-
-        tokens = keyword_re.split(path_format)
-        keywords = tokens[1::2]
-
-        tokens[1::2] = map("(?P<{}>[^,;\/]*)".format, keywords)
-        tokens[0::2] = map(re.escape, tokens[0::2])
-
-        # look for back references
-        for i in range(len(tokens)):
-            fm = field_re.match(tokens[i])
-            if fm is not None:
-                name = fm.group(1)
-                back_ref = "(?P={name})".format(name=name)
-                try:
-                    while True:
-                        index = tokens[i + 1 :].index(tokens[i])
-                        tokens[i + 1 + index] = back_ref
-                except ValueError:
-                    pass
-
-        pattern = "".join(tokens)
-        matches = re.match(pattern, path)
+        regex, keywords = compile_template(self.path_format)
+        matches = regex.match(path)
         # TODO: log/print info about what makes the path invalid
         # for example, {show} appears twice in template, but has
         # two different values in the path:
@@ -248,7 +273,7 @@ class Template(object):
             raise InvalidPath(path)
 
         # reclass values based on field format in template
-        formats = self.get_formats()
+        formats = parse_formats(self.path_format)
 
         def cast(k, v):
             return formats.get(k, str)(v)
@@ -352,10 +377,19 @@ def match_template(path, platform=config.PLATFORM, scope=None):
     # stores the return value
     template = None
 
+    # conform path slashes once for the literal prefix check below
+    conformed = str(path).replace("\\", "/")
+
     # return first matching template or raise ValueError
     for name in ordered:
+        path_format = env[name]
+
+        # skip templates whose leading literal text cannot match the path
+        prefix = str(path_format).replace("\\", "/").split("{", 1)[0]
+        if not conformed.startswith(prefix):
+            continue
+
         try:
-            path_format = env[name]
             template_test = Template(path_format)
 
             if template_test.get_fields(path):
@@ -39,7 +39,6 @@ import sys
 
 from envstack import config
 from envstack.exceptions import CyclicalReference
-from collections import OrderedDict
 
 # value for unresolvable variables
 null = ""
@@ -49,6 +48,22 @@ variable_pattern = re.compile(
     r"\$\{([a-zA-Z_][a-zA-Z0-9_]*)(?::([=?])(\$\{[a-zA-Z_][a-zA-Z0-9_]*\}|[^}]*))?\}"
 )
 
+# regular expression pattern for variable names
+name_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# regular expression patterns for plain decimal int and float literals
+int_pattern = re.compile(r"0|[1-9][0-9]*")
+float_pattern = re.compile(r"[0-9]+\.[0-9]*|\.[0-9]+")
+
+# names that literal_eval evaluates rather than rejects
+literal_names = ("True", "False", "None")
+
+# characters that cannot start a python literal, e.g. the leading / of a path
+non_literal_chars = frozenset("!$%&)*,/:;<=>?@]^`|}~")
+
+# path separators by platform name
+pathsep_by_platform = {"darwin": ":", "linux": ":", "windows": ";"}
+
 
 def clear_sys_path(var: str = "PYTHONPATH"):
     """
@@ -95,7 +110,22 @@ def dedupe_list(lst: list):
     :param lst: The list to deduplicate.
     :return: The deduplicated list.
     """
-    return list(OrderedDict.fromkeys(lst))
+    return list(dict.fromkeys(lst))
+
+
+def dedupe_paths(paths: str, pathsep: str = os.pathsep, platform: str = None):
+    """
+    Deduplicates a colon-separated string of paths while preserving the
+    original order, and joins them with the given path separator.
+
+    :param paths: The colon-separated paths to deduplicate.
+    :param pathsep: The path separator to join with.
+    :param platform: Optional platform name, overrides pathsep.
+    :return: The deduplicated paths as a string.
+    """
+    if platform:
+        pathsep = pathsep_by_platform.get(platform, pathsep)
+    return pathsep.join(dict.fromkeys(paths.split(":")))
 
 
 def dict_diff(dict1: dict, dict2: dict):
@@ -106,12 +136,19 @@ def dict_diff(dict1: dict, dict2: dict):
     :param dict2: Second dictionary.
     :returns: diff dict: 'added', 'removed', 'changed', and 'unchanged'.
     """
-    added = {k: dict2[k] for k in dict2 if k not in dict1}
-    removed = {k: dict1[k] for k in dict1 if k not in dict2}
-    changed = {
-        k: (dict1[k], dict2[k]) for k in dict1 if k in dict2 and dict1[k] != dict2[k]
-    }
-    unchanged = {k: dict1[k] for k in dict1 if k in dict2 and dict1[k] == dict2[k]}
+    added = {k: dict2[k] for k in dict2.keys() - dict1.keys()}
+    removed = {k: dict1[k] for k in dict1.keys() - dict2.keys()}
+    changed = {}
+    unchanged = {}
+
+    # compare shared keys in a single pass
+    for k, v in dict1.items():
+        if k not in dict2:
+            continue
+        elif v == dict2[k]:
+            unchanged[k] = v
+        else:
+            changed[k] = (v, dict2[k])
 
     return {
         "added": added,
@@ -129,8 +166,12 @@ def encode(env: dict):
     :param resolved: fully resolve values (default=True).
     :returns: dict with bytestring key/values.
     """
-    c = lambda v: str(v)
-    return dict((c(k), c(v)) for k, v in env.items())
+    # values are mostly plain str already, so skip the str() call for those;
+    # str subclasses such as EnvVar are still converted
+    return {
+        k if type(k) is str else str(k): v if type(v) is str else str(v)
+        for k, v in env.items()
+    }
 
 
 def get_paths_from_var(
@@ -173,7 +214,7 @@ def get_stack_name(name: str = config.DEFAULT_NAMESPACE):
         raise ValueError("Invalid input type. Expected string, tuple, or list.")
 
 
-def evaluate_modifiers(expression: str, environ: dict = os.environ):
+def evaluate_modifiers(expression: str, environ: dict = os.environ, memo: dict = None):
     """
     Evaluates Bash-like variable expansion modifiers.
 
@@ -185,12 +226,38 @@ def evaluate_modifiers(expression: str, environ: dict = os.environ):
 
     :param expression: The Bash-like string, e.g.,
         "${VAR:=default}/path", "${VAR}/path", or "${VAR:?error message}"
+    :param environ: The environment to resolve variables from.
+    :param memo: Optional dict of already evaluated expressions, shared by
+        calls that resolve against the same environ.
     :return: The resulting evaluated string with all substitutions applied.
     :raises CyclicalReference: If a cyclical reference is detected.
     :raises ValueError: If a variable is undefined and has the :? syntax with an
         error message.
     """
 
+    # plain strings without variables or path separators evaluate to
+    # themselves, so skip the regex engine entirely
+    if type(expression) is str and "${" not in expression and ":" not in expression:
+        return expression
+
+    # direct ${VAR} substitution of a literal value needs no regex either
+    if (
+        type(expression) is str
+        and expression.startswith("${")
+        and expression.endswith("}")
+    ):
+        var_name = expression[2:-1]
+        if name_pattern.fullmatch(var_name):
+            if var_name in environ:
+                value = environ[var_name]
+            else:
+                value = os.getenv(var_name, null)
+            if type(value) is str and "$" not in value and ":" not in value:
+                return value
+
+    # names of variables whose values are currently being expanded
+    expanding = set()
+
     def substitute_variable(match):
         """Substitute a variable match with its value."""
         var_name = match.group(1)
@@ -213,7 +280,7 @@ def evaluate_modifiers(expression: str, environ: dict = os.environ):
             if override:
                 value = override
             elif variable_pattern.search(value) or value is None:
-                value = evaluate_modifiers(argument, environ)
+                value = evaluate(argument)
             else:
                 value = value or argument
         elif operator == "?":
@@ -221,45 +288,70 @@ def evaluate_modifiers(expression: str, environ: dict = os.environ):
                 error_message = argument if argument else f"{var_name} is not set"
                 raise ValueError(error_message)
         elif variable_pattern.search(value):
-            value = evaluate_modifiers(value, environ)
+            # expanding a variable again from within its own value can only
+            # recurse forever, so fail fast instead of hitting RecursionError
+            if var_name in expanding:
+                raise CyclicalReference(f"Cyclical reference detected in {expression}")
+            expanding.add(var_name)
+            try:
+                value = evaluate(value)
+            finally:
+                expanding.discard(var_name)
         # handle simple ${VAR} substitution
         elif operator is None:
             value = value or ""
 
         return value
 
-    try:
-        # substitute all matches in the expression
-        result = variable_pattern.sub(substitute_variable, expression)
+    def evaluate(expr):
+        """Evaluate a string expression, and any values it references."""
+        # return previously evaluated expressions
+        if memo is not None and expr in memo:
+            return memo[expr]
+
+        try:
+            # substitute all matches in the expression
+            result = variable_pattern.sub(substitute_variable, expr)
+
+            # dedupe paths and convert to platform-specific path separators
+            if ":" in result:
+                result = dedupe_paths(result)
+
+        # detect recursion errors
+        except RecursionError:
+            raise CyclicalReference(f"Cyclical reference detected in {expr}")
 
-        # dedupe paths and convert to platform-specific path separators
-        if ":" in result:
-            result = os.pathsep.join(dedupe_list(result.split(":")))
+        # non-string values substituted into the expression
+        except TypeError:
+            result = expr
 
-    # detect recursion errors
-    except RecursionError:
-        raise CyclicalReference(f"Cyclical reference detected in {expression}")
+        if memo is not None:
+            memo[expr] = result
 
-    # evaluate list elements
-    except TypeError:
+        return result
+
+    # dispatch non-string values on type up front rather than catching the
+    # TypeError raised by re.sub()
+    if not isinstance(expression, str):
+        # evaluate list elements
         if isinstance(expression, list):
-            result = [
+            return [
                 variable_pattern.sub(substitute_variable, str(v))
                 if isinstance(v, str)
                 else v
                 for v in expression
             ]
+        # evaluate dict values
         elif isinstance(expression, dict):
-            result = {
+            return {
                 k: variable_pattern.sub(substitute_variable, str(v))
                 if isinstance(v, str)
                 else v
                 for k, v in expression.items()
             }
-        else:
-            result = expression
+        return expression
 
-    return result
+    return evaluate(expression)
 
 
 def load_sys_path(
@@ -295,6 +387,19 @@ def safe_eval(value: str):
         eval_func = eval
 
     if type(value) == str:
+        # plain numbers and names do not need one or two ast parses
+        try:
+            if int_pattern.fullmatch(value):
+                return int(value)
+            if float_pattern.fullmatch(value):
+                return float(value)
+        except ValueError:
+            pass
+        if value.isidentifier() and value not in literal_names:
+            return value
+        if value[:1] in non_literal_chars:
+            return value
+
         try:
             return eval_func(value)
         except Exception:
@@ -376,11 +481,17 @@ def validate_yaml(file_path: str):
     """
     import yaml
 
+    # use the libyaml bindings when available
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+
     required_keys = {"all", "darwin", "linux", "windows"}
 
     try:
         with open(file_path, "r") as stream:
-            data = yaml.safe_load(stream.read())
+            data = yaml.load(stream, Loader=SafeLoader)
 
         if not isinstance(data, dict):
             raise yaml.YAMLError("invalid data structure")
@@ -43,6 +43,12 @@ from envstack import config, logger
 from envstack.env import load_environ, resolve_environ
 from envstack.util import encode, evaluate_modifiers
 
+# matches shell $VAR references in commands
+shell_var_re = re.compile(r"\$\w+")
+
+# matches {VAR} placeholders in commands, converted to shell variables
+brace_var_re = re.compile(r"\{(\w+)\}")
+
 
 def to_args(cmd: str):
     """
@@ -103,6 +109,7 @@ class Wrapper(object):
         self.args = args
         self.name = namespace
         self.shell = True
+        self.close_fds = True
         self.log = logger.log
         self.env = load_environ(namespace)
 
@@ -117,9 +124,12 @@ class Wrapper(object):
         command = self.get_subprocess_command(env)
 
         try:
+            # subclasses may set close_fds to False to let subprocess use
+            # posix_spawn, if inherited fds are allowed to leak to the tool
             process = subprocess.Popen(
                 args=command,
                 bufsize=0,
+                close_fds=self.close_fds,
                 env=encode(env),
                 shell=self.shell,
             )
@@ -206,7 +216,7 @@ class ShellWrapper(CommandWrapper):
 
     def get_subprocess_command(self, env: dict):
         """Returns the command to be passed to the shell in a subprocess."""
-        if re.search(r"\$\w+", self.cmd):
+        if "$" in self.cmd and shell_var_re.search(self.cmd):
             if self.interactive:
                 return f'{config.SHELL} -i -c "{self.cmd}"'
             return f'{config.SHELL} -c "{self.cmd}"'
@@ -273,10 +283,10 @@ def run_command(command: str, namespace: str = config.DEFAULT_NAMESPACE):
     logger.setup_stream_handler()
     shellname = os.path.basename(config.SHELL)
     if shellname in ["bash", "sh", "zsh"]:
-        command = re.sub(r"\{(\w+)\}", r"${\1}", shell_join(command))
+        command = brace_var_re.sub(r"${\1}", shell_join(command))
         cmd = ShellWrapper(namespace, command)
     elif shellname in ["cmd"]:
-        command = re.sub(r"\{(\w+)\}", r"%\1%", " ".join(command))
+        command = brace_var_re.sub(r"%\1%", " ".join(command))
         cmd = CmdWrapper(namespace, command)
     else:
         cmd = CommandWrapper(namespace, command)
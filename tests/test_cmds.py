@@ -36,21 +36,65 @@ Contains unit tests for running commands.
 import os
 import shutil
 import subprocess
+import sys
 import unittest
+from unittest import mock
 
-from test_env import create_test_root, update_env_file
+from test_env import ENV_PATH, create_test_root, restore_env_file, update_env_file
+
+# these tests run bin/envstack directly through a posix shell, so skip the
+# whole module up front on windows rather than failing every test
+if sys.platform == "win32":
+    raise unittest.SkipTest("command tests require a posix shell")
+
+# path to the envstack command
+ENVSTACK_BIN = os.path.join(os.path.dirname(__file__), "..", "bin", "envstack")
+
+# python command that prints DEPLOY_ROOT after initializing the distman stack
+DEPLOY_ROOT_CMD = (
+    "python -c \"import os,envstack;envstack.init('distman');"
+    "print(os.getenv('DEPLOY_ROOT'))\""
+)
 
 
 class TestUnresolved(unittest.TestCase):
     """Tests unresolved environment variables."""
 
-    def setUp(self):
-        self.envstack_bin = os.path.join(
-            os.path.dirname(__file__), "..", "bin", "envstack"
-        )
-        envpath = os.path.join(os.path.dirname(__file__), "..", "env")
-        os.environ["ENVPATH"] = envpath
+    # stack commands are independent, so they are started together up front
+    commands = [
+        ENVSTACK_BIN,
+        "%s dev" % ENVSTACK_BIN,
+        "%s distman" % ENVSTACK_BIN,
+        "%s hello" % ENVSTACK_BIN,
+        "%s thing" % ENVSTACK_BIN,
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ["ENVPATH"] = ENV_PATH
         os.environ["INTERACTIVE"] = "0"
+        cls.procs = {
+            command: subprocess.Popen(
+                command, shell=True, stdout=subprocess.PIPE, universal_newlines=True
+            )
+            for command in cls.commands
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        for proc in cls.procs.values():
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+    def check_output(self, command: str):
+        """Returns the output of a command started in setUpClass."""
+        proc = self.procs[command]
+        output, _ = proc.communicate()
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, command, output)
+        return output
 
     def test_default(self):
         expected_output = """DEPLOY_ROOT=${ROOT}/${ENV}
@@ -63,8 +107,8 @@ PYTHONPATH=${DEPLOY_ROOT}/lib/python:${PYTHONPATH}
 ROOT=/mnt/pipe
 STACK=default
 """
-        command = self.envstack_bin
-        output = subprocess.check_output(command, shell=True, universal_newlines=True)
+        command = ENVSTACK_BIN
+        output = self.check_output(command)
         self.assertEqual(output, expected_output)
 
     def test_dev(self):
@@ -78,8 +122,8 @@ PYTHONPATH=${ROOT}/dev/lib/python:${ROOT}/prod/lib/python:${PYTHONPATH}
 ROOT=/mnt/pipe
 STACK=dev
 """
-        command = "%s dev" % self.envstack_bin
-        output = subprocess.check_output(command, shell=True, universal_newlines=True)
+        command = "%s dev" % ENVSTACK_BIN
+        output = self.check_output(command)
         self.assertEqual(output, expected_output)
 
     def test_distman(self):
@@ -93,8 +137,8 @@ PYTHONPATH=${DEPLOY_ROOT}/lib/python:${PYTHONPATH}
 ROOT=/mnt/pipe
 STACK=distman
 """
-        command = "%s distman" % self.envstack_bin
-        output = subprocess.check_output(command, shell=True, universal_newlines=True)
+        command = "%s distman" % ENVSTACK_BIN
+        output = self.check_output(command)
         self.assertEqual(output, expected_output)
 
     def test_hello(self):
@@ -109,8 +153,8 @@ PYTHONPATH=${DEPLOY_ROOT}/lib/python:${PYTHONPATH}
 ROOT=/mnt/pipe
 STACK=hello
 """
-        command = "%s hello" % self.envstack_bin
-        output = subprocess.check_output(command, shell=True, universal_newlines=True)
+        command = "%s hello" % ENVSTACK_BIN
+        output = self.check_output(command)
         self.assertEqual(output, expected_output)
 
     def test_thing(self):
@@ -129,30 +173,35 @@ PYTHONPATH=${DEPLOY_ROOT}/lib/python:${PYTHONPATH}
 ROOT=${HOME}/.local/pipe
 STACK=thing
 """
-        command = "%s thing" % self.envstack_bin
-        output = subprocess.check_output(command, shell=True, universal_newlines=True)
+        command = "%s thing" % ENVSTACK_BIN
+        output = self.check_output(command)
         self.assertEqual(output, expected_output)
 
 
 class TestResolved(unittest.TestCase):
     """Tests resolved environment variables."""
 
-    def setUp(self):
-        self.envstack_bin = os.path.join(
-            os.path.dirname(__file__), "..", "bin", "envstack"
-        )
-        envpath = os.path.join(os.path.dirname(__file__), "..", "env")
-        os.environ["ENVPATH"] = envpath
+    @classmethod
+    def setUpClass(cls):
+        cls.root = os.environ.get("ROOT")
+        os.environ["ENVPATH"] = ENV_PATH
         os.environ["INTERACTIVE"] = "0"
         os.environ["ROOT"] = "/var/tmp/pipe"  # ROOT cannot be overridden
 
+    @classmethod
+    def tearDownClass(cls):
+        if cls.root is None:
+            os.environ.pop("ROOT", None)
+        else:
+            os.environ["ROOT"] = cls.root
+
     def test_default(self):
         expected_output = """DEPLOY_ROOT=/mnt/pipe/prod
 HELLO=world
 ROOT=/mnt/pipe
 STACK=default
 """
-        command = "%s -r DEPLOY_ROOT HELLO ROOT STACK" % self.envstack_bin
+        command = "%s -r DEPLOY_ROOT HELLO ROOT STACK" % ENVSTACK_BIN
         output = subprocess.check_output(command, shell=True, universal_newlines=True)
         self.assertEqual(output, expected_output)
 
@@ -162,7 +211,7 @@ HELLO=world
 ROOT=/mnt/pipe
 STACK=dev
 """
-        command = "%s dev -r DEPLOY_ROOT HELLO ROOT STACK" % self.envstack_bin
+        command = "%s dev -r DEPLOY_ROOT HELLO ROOT STACK" % ENVSTACK_BIN
         output = subprocess.check_output(command, shell=True, universal_newlines=True)
         self.assertEqual(output, expected_output)
 
@@ -171,7 +220,7 @@ STACK=dev
 ROOT=/mnt/pipe
 STACK=distman
 """
-        command = "%s distman -r DEPLOY_ROOT ROOT STACK" % self.envstack_bin
+        command = "%s distman -r DEPLOY_ROOT ROOT STACK" % ENVSTACK_BIN
         output = subprocess.check_output(command, shell=True, universal_newlines=True)
         self.assertEqual(output, expected_output)
 
@@ -180,7 +229,7 @@ STACK=distman
 ROOT=/mnt/pipe
 STACK=distman
 """
-        command = "%s dev distman -r DEPLOY_ROOT ROOT STACK" % self.envstack_bin
+        command = "%s dev distman -r DEPLOY_ROOT ROOT STACK" % ENVSTACK_BIN
         output = subprocess.check_output(command, shell=True, universal_newlines=True)
         self.assertEqual(output, expected_output)
 
@@ -192,7 +241,7 @@ STACK=test
 """
         command = (
             "ENV=blah ROOT=/var/tmp %s test -r DEPLOY_ROOT HELLO ROOT STACK"
-            % self.envstack_bin
+            % ENVSTACK_BIN
         )
         output = subprocess.check_output(command, shell=True, universal_newlines=True)
         self.assertEqual(output, expected_output)
@@ -205,7 +254,7 @@ STACK=foobar
 """
         command = (
             "ENV=blah ROOT=/var/tmp %s test foobar -r DEPLOY_ROOT HELLO ROOT STACK"
-            % self.envstack_bin
+            % ENVSTACK_BIN
         )
         output = subprocess.check_output(command, shell=True, universal_newlines=True)
         self.assertEqual(output, expected_output)
@@ -217,7 +266,7 @@ STACK=foobar
 DEPLOY_ROOT={deploy_root}
 HELLO=goodbye
 """
-        command = "%s thing -r DEPLOY_ROOT HELLO CHAR_LIST" % self.envstack_bin
+        command = "%s thing -r DEPLOY_ROOT HELLO CHAR_LIST" % ENVSTACK_BIN
         output = subprocess.check_output(command, shell=True, universal_newlines=True)
         self.assertEqual(output, expected_output)
 
@@ -225,50 +274,29 @@ HELLO=goodbye
 class TestCommands(unittest.TestCase):
     """Tests various envstack commands."""
 
-    def setUp(self):
-        self.envstack_bin = os.path.join(
-            os.path.dirname(__file__), "..", "bin", "envstack"
-        )
-        envpath = os.path.join(os.path.dirname(__file__), "..", "env")
-        os.environ["ENVPATH"] = envpath
+    @classmethod
+    def setUpClass(cls):
+        os.environ["ENVPATH"] = ENV_PATH
         os.environ["INTERACTIVE"] = "0"
 
-    def test_default_echo(self):
-        command = "%s -- echo {HELLO}" % self.envstack_bin
-        expected_output = "world\n"
-        output = subprocess.check_output(
-            command,
-            shell=True,
-            universal_newlines=True,
-        )
-        self.assertEqual(output, expected_output)
-
     def test_default_ls(self):
-        command = "%s -- ls" % self.envstack_bin
+        command = "%s -- ls" % ENVSTACK_BIN
         expected_output = subprocess.check_output(
             "ls", start_new_session=True, shell=True, universal_newlines=True
         )
         output = subprocess.check_output(command, shell=True, universal_newlines=True)
         self.assertEqual(output, expected_output)
 
-    def test_thing_echo(self):
-        command = "%s thing -- echo {HELLO}" % self.envstack_bin
-        expected_output = "goodbye\n"
-        output = subprocess.check_output(
-            command, start_new_session=True, shell=True, universal_newlines=True
-        )
-        self.assertEqual(output, expected_output)
-
     def test_test_echo_deploy_root(self):
-        command = "%s test -- echo {DEPLOY_ROOT}" % self.envstack_bin
+        command = "%s test -- echo {DEPLOY_ROOT}" % ENVSTACK_BIN
         expected_output = "/mnt/pipe/test\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
         )
         self.assertEqual(output, expected_output)
 
-    def test_test_echo_deploy_root(self):
-        command = "%s test foobar -- echo {DEPLOY_ROOT}" % self.envstack_bin
+    def test_test_foobar_echo_deploy_root(self):
+        command = "%s test foobar -- echo {DEPLOY_ROOT}" % ENVSTACK_BIN
         expected_output = "/mnt/pipe/foobar\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -279,16 +307,13 @@ class TestCommands(unittest.TestCase):
 class TestVarFlow(unittest.TestCase):
     """Tests the flow of environment variables through stacks."""
 
-    def setUp(self):
-        self.envstack_bin = os.path.join(
-            os.path.dirname(__file__), "..", "bin", "envstack"
-        )
-        envpath = os.path.join(os.path.dirname(__file__), "..", "env")
-        os.environ["ENVPATH"] = envpath
+    @classmethod
+    def setUpClass(cls):
+        os.environ["ENVPATH"] = ENV_PATH
         os.environ["INTERACTIVE"] = "0"
 
     def test_default_hello(self):
-        command = "%s -- echo {HELLO}" % self.envstack_bin
+        command = "%s -- echo {HELLO}" % ENVSTACK_BIN
         expected_output = "world\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -296,7 +321,7 @@ class TestVarFlow(unittest.TestCase):
         self.assertEqual(output, expected_output)
 
     def test_dev_hello(self):
-        command = "%s dev -- echo {HELLO}" % self.envstack_bin
+        command = "%s dev -- echo {HELLO}" % ENVSTACK_BIN
         expected_output = "world\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -304,7 +329,7 @@ class TestVarFlow(unittest.TestCase):
         self.assertEqual(output, expected_output)
 
     def test_thing_hello(self):
-        command = "%s thing -- echo {HELLO}" % self.envstack_bin
+        command = "%s thing -- echo {HELLO}" % ENVSTACK_BIN
         expected_output = "goodbye\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -312,7 +337,7 @@ class TestVarFlow(unittest.TestCase):
         self.assertEqual(output, expected_output)
 
     def test_thing_hello_multiple(self):
-        command = "%s default dev thing -- echo {HELLO}" % self.envstack_bin
+        command = "%s default dev thing -- echo {HELLO}" % ENVSTACK_BIN
         expected_output = "goodbye\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -323,18 +348,23 @@ class TestVarFlow(unittest.TestCase):
 class TestDistman(unittest.TestCase):
     """Tests value for $DEPLOY_ROOT under various environment configurations."""
 
-    def setUp(self):
-        self.envstack_bin = os.path.join(
-            os.path.dirname(__file__), "..", "bin", "envstack"
-        )
-        self.python_cmd = """python -c \"import os,envstack;envstack.init('distman');print(os.getenv('DEPLOY_ROOT'))\""""
-        envpath = os.path.join(os.path.dirname(__file__), "..", "env")
-        os.environ["ENVPATH"] = envpath
+    @classmethod
+    def setUpClass(cls):
+        os.environ["ENVPATH"] = ENV_PATH
         os.environ["INTERACTIVE"] = "0"
 
+    def setUp(self):
+        self.env = os.environ.get("ENV")
+
+    def tearDown(self):
+        if self.env is None:
+            os.environ.pop("ENV", None)
+        else:
+            os.environ["ENV"] = self.env
+
     def test_default_deploy_root(self):
         os.environ["ENV"] = "invalid"  # should not be able to override ENV
-        command = "%s -- %s" % (self.envstack_bin, self.python_cmd)
+        command = "%s -- %s" % (ENVSTACK_BIN, DEPLOY_ROOT_CMD)
         expected_output = "/mnt/pipe/prod\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -343,7 +373,7 @@ class TestDistman(unittest.TestCase):
 
     def test_dev_deploy_root(self):
         os.environ["ENV"] = "invalid"  # should not be able to override ENV
-        command = "%s dev -- %s" % (self.envstack_bin, self.python_cmd)
+        command = "%s dev -- %s" % (ENVSTACK_BIN, DEPLOY_ROOT_CMD)
         expected_output = "/mnt/pipe/dev\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -351,7 +381,7 @@ class TestDistman(unittest.TestCase):
         self.assertEqual(output, expected_output)
 
     def test_test_deploy_root(self):
-        command = "ENV=invalid %s test -- %s" % (self.envstack_bin, self.python_cmd)
+        command = "ENV=invalid %s test -- %s" % (ENVSTACK_BIN, DEPLOY_ROOT_CMD)
         expected_output = "/mnt/pipe/test\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -359,10 +389,7 @@ class TestDistman(unittest.TestCase):
         self.assertEqual(output, expected_output)
 
     def test_foobar_deploy_root(self):
-        command = "ENV=invalid %s test foobar -- %s" % (
-            self.envstack_bin,
-            self.python_cmd,
-        )
+        command = "ENV=invalid %s test foobar -- %s" % (ENVSTACK_BIN, DEPLOY_ROOT_CMD)
         expected_output = "/mnt/pipe/foobar\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -371,30 +398,35 @@ class TestDistman(unittest.TestCase):
 
 
 class TestIssues(unittest.TestCase):
-    def setUp(self):
-        self.root = create_test_root()
-        self.envstack_bin = os.path.join(
-            os.path.dirname(__file__), "..", "bin", "envstack"
-        )
-        os.environ["ENVPATH"] = os.path.join(self.root, "prod", "env")
-        os.environ["INTERACTIVE"] = "0"
+    @classmethod
+    def setUpClass(cls):
+        cls.root = create_test_root()
 
-    def tearDown(self):
-        shutil.rmtree(self.root)
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def setUp(self):
+        envpath = os.path.join(self.root, "prod", "env")
+        patcher = mock.patch.dict(os.environ, {"ENVPATH": envpath, "INTERACTIVE": "0"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_issue_30_echo(self):
         """Test that the correct value of PYEXE is used."""
 
         # update default.env to point to test root
         default_env_file = os.path.join(self.root, "prod", "env", "default.env")
+        self.addCleanup(restore_env_file, default_env_file)
         update_env_file(default_env_file, "ROOT", self.root)
 
         # update the dev hello.env to modify the PYEXE
         hello_env_file = os.path.join(self.root, "dev", "env", "hello.env")
+        self.addCleanup(restore_env_file, hello_env_file)
         update_env_file(hello_env_file, "PYEXE", "/usr/bin/foobar")
 
         # test "default" should have values from prod only
-        command = "%s hello -- echo {PYEXE}" % self.envstack_bin
+        command = "%s hello -- echo {PYEXE}" % ENVSTACK_BIN
         expected_output = "/usr/bin/python\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -402,7 +434,7 @@ class TestIssues(unittest.TestCase):
         self.assertEqual(output, expected_output)
 
         # test "dev" should have values from dev and prod
-        command = "%s dev hello -- echo {PYEXE}" % self.envstack_bin
+        command = "%s dev hello -- echo {PYEXE}" % ENVSTACK_BIN
         expected_output = "/usr/bin/foobar\n"
         output = subprocess.check_output(
             command, start_new_session=True, shell=True, universal_newlines=True
@@ -415,14 +447,16 @@ class TestIssues(unittest.TestCase):
 
         # update default.env to point to test root
         default_env_file = os.path.join(self.root, "prod", "env", "default.env")
+        self.addCleanup(restore_env_file, default_env_file)
         update_env_file(default_env_file, "ROOT", self.root)
 
         # update the dev hello.env to modify the PYEXE
         hello_env_file = os.path.join(self.root, "dev", "env", "hello.env")
+        self.addCleanup(restore_env_file, hello_env_file)
         update_env_file(hello_env_file, "PYEXE", "/usr/bin/foobar")
 
         # test "default" should only include prod sources
-        command = "%s hello --sources" % self.envstack_bin
+        command = "%s hello --sources" % ENVSTACK_BIN
         expected_output = f"""{self.root}/prod/env/default.env
 {self.root}/prod/env/hello.env
 """
@@ -432,7 +466,7 @@ class TestIssues(unittest.TestCase):
         self.assertEqual(output, expected_output)
 
         # test "dev" should include prod and dev sources
-        command = "%s dev hello --sources" % self.envstack_bin
+        command = "%s dev hello --sources" % ENVSTACK_BIN
         expected_output = f"""{self.root}/prod/env/default.env
 {self.root}/prod/env/dev.env
 {self.root}/prod/env/hello.env
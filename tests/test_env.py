@@ -33,47 +33,138 @@ __doc__ = """
 Contains unit tests for the env.py module.
 """
 
+import functools
+import json
 import os
+import re
 import shutil
 import sys
 import unittest
 import tempfile
+import traceback
+from unittest import mock
+
+import yaml
 
 import envstack
-from envstack.env import Env, EnvVar, Scope, Source
+from envstack.env import (
+    Env,
+    EnvVar,
+    Scope,
+    Source,
+    clear_file_cache,
+    load_environ,
+    resolve_environ,
+)
+from envstack import util
 from envstack.util import dict_diff
 
+# path to the test "env" folder
+ENV_PATH = os.path.join(os.path.dirname(__file__), "..", "env")
+
+# use the libyaml bindings when available
+try:
+    from yaml import CSafeDumper as Dumper, CSafeLoader as Loader
+except ImportError:
+    from yaml import SafeDumper as Dumper, SafeLoader as Loader
+
 
 def create_test_root():
     """Creates a temporary directory with the contents of the "env" folder."""
 
     # create a temporary directory
-    root = tempfile.mkdtemp()
+    root = tempfile.mkdtemp(prefix="envstack-")
 
     # copy the contents of the "env" folder to the temp dir
-    env_path = os.path.join(os.path.dirname(__file__), "..", "env")
-
     for env in ("prod", "dev"):
-        shutil.copytree(env_path, os.path.join(root, env, "env"))
+        shutil.copytree(
+            ENV_PATH,
+            os.path.join(root, env, "env"),
+            ignore=shutil.ignore_patterns("__pycache__", "*.py[cod]", ".*"),
+            copy_function=link_or_copy,
+        )
 
     return root
 
 
+def link_or_copy(src: str, dst: str):
+    """Hardlinks src to dst, falling back to a copy when linking fails (e.g.
+    across filesystems). Linked files must be unlinked before rewriting."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def restore_env_file(file_path: str):
+    """Restores a .env file in a test root from the "env" folder."""
+    os.unlink(file_path)
+    link_or_copy(os.path.join(ENV_PATH, os.path.basename(file_path)), file_path)
+
+
+def fork_test(func):
+    """Decorator that runs a test method in a forked child process, so changes
+    to os.environ and sys.path are discarded when the child exits."""
+
+    @functools.wraps(func)
+    def wrapper(self):
+        if not hasattr(os, "fork"):
+            return func(self)
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            try:
+                func(self)
+                msg = b"OK"
+            except unittest.SkipTest as e:
+                msg = b"SKIP" + str(e).encode()
+            except BaseException:
+                msg = b"FAIL" + traceback.format_exc().encode()
+            os.write(w, msg)
+            os._exit(0)
+        os.close(w)
+        with os.fdopen(r, "rb") as f:
+            msg = f.read()
+        _, status = os.waitpid(pid, 0)
+        # the child died or exited before writing a result
+        if not msg:
+            if os.WIFSIGNALED(status):
+                reason = "was killed by signal %d" % os.WTERMSIG(status)
+            else:
+                reason = "exited with status %d" % os.WEXITSTATUS(status)
+            self.fail("child process %s before reporting a result" % reason)
+        if msg.startswith(b"SKIP"):
+            raise unittest.SkipTest(msg[4:].decode())
+        if msg != b"OK":
+            self.fail(msg[4:].decode())
+
+    return wrapper
+
+
 def update_env_file(file_path: str, key: str, value: str):
     """Updates a key in a YAML file with a new value."""
-    import yaml
-
-    # read the YAML file
     with open(file_path, "r") as f:
-        data = yaml.safe_load(f)
-
-    for _, env_config in data.items():
-        if isinstance(env_config, dict) and key in env_config:
-            env_config[key] = value
-
-    # write the modified data back to the file
+        content = f.read()
+
+    # replace "KEY: value" lines in place, keeping anchors and merge keys
+    pattern = re.compile(r"^([ \t]*%s:)[ \t].*$" % re.escape(key), re.M)
+    content, count = pattern.subn(
+        lambda m: "%s %s" % (m.group(1), json.dumps(value)), content
+    )
+
+    # fall back to a YAML round-trip, e.g. for keys in flow mappings
+    if not count:
+        data = yaml.load(content, Loader=Loader)
+        for _, env_config in data.items():
+            if isinstance(env_config, dict) and key in env_config:
+                env_config[key] = value
+        content = yaml.dump(data, Dumper=Dumper, sort_keys=False)
+
+    # write the modified data back to a new file, file may be a hardlink
+    os.unlink(file_path)
     with open(file_path, "w") as f:
-        yaml.safe_dump(data, f, sort_keys=False)
+        f.write(content)
 
 
 class TestEnvVar(unittest.TestCase):
@@ -134,6 +225,22 @@ class TestEnv(unittest.TestCase):
         copied = env.copy()
         self.assertEqual(copied, {"FOO": "foo", "BAR": "$FOO"})
 
+    def test_resolve_environ(self):
+        env = Env({"FOO": "foo", "BAR": "${FOO}", "BAZ": "a:b:a", "NUM": 1})
+        resolved = resolve_environ(env)
+        self.assertEqual(resolved, {"FOO": "foo", "BAR": "foo", "BAZ": "a:b", "NUM": 1})
+
+    def test_resolve_environ_nested_list(self):
+        env = Env(
+            {
+                "ROOT": "/mnt",
+                "DEPLOY_ROOT": "${ROOT}/prod",
+                "LIBS": ["${DEPLOY_ROOT}/lib"],
+            }
+        )
+        resolved = resolve_environ(env)
+        self.assertEqual(resolved["LIBS"], ["/mnt/prod/lib"])
+
     def test_set_namespace(self):
         env = Env()
         env.set_namespace("test")
@@ -185,10 +292,10 @@ class TestSource(unittest.TestCase):
 
 
 class TestInit(unittest.TestCase):
+    @fork_test
     def test_init_default(self):
         """Tests init with default stack."""
-        envpath = os.path.join(os.path.dirname(__file__), "..", "env")
-        os.environ["ENVPATH"] = envpath
+        os.environ["ENVPATH"] = ENV_PATH
         os.environ["ROOT"] = "/var/tmp"  # cannot override ROOT
         os.environ["ENV"] = "foobar"  # cannot override ENV
         original_env = os.environ.copy()
@@ -198,11 +305,14 @@ class TestInit(unittest.TestCase):
 
         envstack.init()
         self.assertEqual(os.getenv("ENV"), os.getenv("ENV", "default"))
-        self.assertEqual(os.getenv("STACK"), "default")
-        self.assertEqual(os.getenv("HELLO"), "world")
-        self.assertEqual(os.getenv("LOG_LEVEL"), "INFO")
-        self.assertEqual(os.getenv("ROOT"), "/mnt/pipe")
-        self.assertEqual(os.getenv("DEPLOY_ROOT"), "/mnt/pipe/prod")
+        expected = {
+            "STACK": "default",
+            "HELLO": "world",
+            "LOG_LEVEL": "INFO",
+            "ROOT": "/mnt/pipe",
+            "DEPLOY_ROOT": "/mnt/pipe/prod",
+        }
+        self.assertEqual({k: os.getenv(k) for k in expected}, expected)
         self.assertTrue(len(sys.path) > len(sys_path))
         self.assertTrue(len(os.getenv("PATH")) > len(path))
         self.assertTrue(len(os.getenv("PYTHONPATH")) > len(python_path))
@@ -218,10 +328,10 @@ class TestInit(unittest.TestCase):
         self.assertEqual(os.getenv("PATH"), path)
         self.assertEqual(os.getenv("PYTHONPATH"), python_path)
 
+    @fork_test
     def test_init_dev(self):
         """Tests init with dev stack."""
-        envpath = os.path.join(os.path.dirname(__file__), "..", "env")
-        os.environ["ENVPATH"] = envpath
+        os.environ["ENVPATH"] = ENV_PATH
         os.environ["HELLO"] = "goodbye"
         os.environ["LOG_LEVEL"] = "DEBUG"
         os.environ["ROOT"] = "/var/tmp"  # cannot override ROOT
@@ -230,63 +340,164 @@ class TestInit(unittest.TestCase):
         sys_path = sys.path.copy()
 
         envstack.init("dev")
-        self.assertEqual(os.getenv("ENV"), "dev")
-        self.assertEqual(os.getenv("STACK"), "dev")
-        self.assertEqual(os.getenv("HELLO"), "goodbye")
-        self.assertEqual(os.getenv("LOG_LEVEL"), "DEBUG")
-        self.assertEqual(os.getenv("ROOT"), "/mnt/pipe")
-        self.assertEqual(os.getenv("DEPLOY_ROOT"), "/mnt/pipe/dev")
+        expected = {
+            "ENV": "dev",
+            "STACK": "dev",
+            "HELLO": "goodbye",
+            "LOG_LEVEL": "DEBUG",
+            "ROOT": "/mnt/pipe",
+            "DEPLOY_ROOT": "/mnt/pipe/dev",
+        }
+        self.assertEqual({k: os.getenv(k) for k in expected}, expected)
         self.assertTrue(len(sys.path) > len(sys_path))
 
-        envstack.revert()
+        restored = envstack.revert()
+        self.assertTrue({"DEPLOY_ROOT", "ENV", "ROOT", "STACK"} <= set(restored))
+        self.assertEqual(os.getenv("ENV"), "foobar")
+        self.assertEqual(os.getenv("ROOT"), "/var/tmp")
         diffs = dict_diff(original_env, os.environ)
         self.assertEqual(diffs["added"], {})
         self.assertEqual(diffs["changed"], {})
         self.assertEqual(diffs["removed"], {})
         self.assertEqual(diffs["unchanged"], original_env)
 
+    @fork_test
     def test_init_zzz_custom(self):
         """Tests init with custom test stack."""
-        envpath = os.path.join(os.path.dirname(__file__), "..", "env")
-        os.environ["ENVPATH"] = envpath
+        os.environ["ENVPATH"] = ENV_PATH
         os.environ["HELLO"] = "goodbye"
         os.environ["ENV"] = "foobar"  # cannot override ENV
         original_env = os.environ.copy()
         sys_path = sys.path.copy()
 
         envstack.init("test", "custom", ignore_missing=True)
-        self.assertEqual(os.getenv("ENV"), "custom")
-        self.assertEqual(os.getenv("STACK"), "custom")
-        self.assertEqual(os.getenv("DEPLOY_ROOT"), "/mnt/pipe/custom")
+        expected = {
+            "ENV": "custom",
+            "STACK": "custom",
+            "DEPLOY_ROOT": "/mnt/pipe/custom",
+        }
+        self.assertEqual({k: os.getenv(k) for k in expected}, expected)
         self.assertTrue(len(sys.path) > len(sys_path))
 
-        envstack.revert()
+        restored = envstack.revert()
+        self.assertTrue({"DEPLOY_ROOT", "ENV", "STACK"} <= set(restored))
+        self.assertEqual(os.getenv("ENV"), "foobar")
         diffs = dict_diff(original_env, os.environ)
         self.assertEqual(diffs["added"], {})
         self.assertEqual(diffs["changed"], {})
         self.assertEqual(diffs["removed"], {})
         self.assertEqual(diffs["unchanged"], original_env)
 
+    @fork_test
+    def test_save_revert_twice(self):
+        """Tests that each save after a revert takes a new snapshot."""
+        envstack.save()
+        envstack.revert()
+        os.environ["NEWVAR"] = "keep"
+        envstack.save()
+        os.environ["OTHERVAR"] = "drop"
+        restored = envstack.revert()
+        self.assertEqual(restored, ["OTHERVAR"])
+        self.assertEqual(os.getenv("NEWVAR"), "keep")
+        self.assertEqual(os.getenv("OTHERVAR"), None)
+
+
+class TestLoadEnviron(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.root = create_test_root()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def setUp(self):
+        envpath = os.path.join(self.root, "prod", "env")
+        patcher = mock.patch.dict(os.environ, {"ENVPATH": envpath})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        clear_file_cache()
+
+    def tearDown(self):
+        clear_file_cache()
+
+    def test_independent_loads(self):
+        """Tests loaded environments are independent and see modified and
+        newly created source files."""
+        environ = os.environ.copy()
+        env = load_environ("hello")
+        self.assertEqual(os.environ, environ)
+        env["PYEXE"] = "/usr/bin/modified"
+        env = load_environ("hello")
+        self.assertEqual(env["PYEXE"], "/usr/bin/python")
+        self.assertEqual(len(env.sources), 2)
+
+        hello_env_file = os.path.join(self.root, "prod", "env", "hello.env")
+        self.addCleanup(restore_env_file, hello_env_file)
+        update_env_file(hello_env_file, "PYEXE", "/usr/bin/foobar")
+        env = load_environ("hello")
+        self.assertEqual(env["PYEXE"], "/usr/bin/foobar")
+
+        scope = os.path.join(self.root, "scope", "a", "b")
+        os.makedirs(scope)
+        env = load_environ("hello", scope=scope)
+        self.assertEqual(env["PYEXE"], "/usr/bin/foobar")
+        with open(os.path.join(scope, "hello.env"), "w") as f:
+            for platform in ("all", "darwin", "linux", "windows"):
+                f.write("%s:\n  PYEXE: /usr/bin/scoped\n" % platform)
+        env = load_environ("hello", scope=scope)
+        self.assertEqual(env["PYEXE"], "/usr/bin/scoped")
+
+    def test_file_cache(self):
+        """Tests .env files are parsed once, until they are modified."""
+        with mock.patch.object(
+            util, "validate_yaml", wraps=util.validate_yaml
+        ) as validate_yaml:
+            load_environ("hello")
+            load_environ(["dev", "hello"])
+            paths = [str(c.args[0]) for c in validate_yaml.call_args_list]
+            self.assertEqual(len(paths), len(set(paths)))
+
+            default_env_file = os.path.join(self.root, "prod", "env", "default.env")
+            self.addCleanup(restore_env_file, default_env_file)
+            update_env_file(default_env_file, "ROOT", self.root)
+            validate_yaml.reset_mock()
+            env = load_environ("hello")
+            paths = [str(c.args[0]) for c in validate_yaml.call_args_list]
+            self.assertEqual(paths, [default_env_file])
+            self.assertEqual(env["ROOT"], self.root)
+
 
 class TestIssues(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.root = create_test_root()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
     def setUp(self):
-        self.root = create_test_root()
-        os.environ["ENVPATH"] = os.path.join(self.root, "prod", "env")
-        os.environ["INTERACTIVE"] = "0"
+        envpath = os.path.join(self.root, "prod", "env")
+        patcher = mock.patch.dict(os.environ, {"ENVPATH": envpath, "INTERACTIVE": "0"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def tearDown(self):
         envstack.revert()
-        shutil.rmtree(self.root)
+        clear_file_cache()
 
     def test_issue_30_init(self):
         """Tests issue #30 with envstack.init()."""
 
         # update default.env to point to test root
         default_env_file = os.path.join(self.root, "prod", "env", "default.env")
+        self.addCleanup(restore_env_file, default_env_file)
         update_env_file(default_env_file, "ROOT", self.root)
 
         # update the dev hello.env to modify the PYEXE
         hello_env_file = os.path.join(self.root, "dev", "env", "hello.env")
+        self.addCleanup(restore_env_file, hello_env_file)
         update_env_file(hello_env_file, "PYEXE", "/usr/bin/foobar")
 
         # set the ENVPATH to the test root
@@ -306,7 +517,6 @@ class TestIssues(unittest.TestCase):
 
     def test_issue_30_sources_default(self):
         """Tests issue #30 with load_environ and checking default sources."""
-        from envstack.env import load_environ
 
         # load hello stack
         env = load_environ("hello")
@@ -320,10 +530,10 @@ class TestIssues(unittest.TestCase):
 
     def test_issue_30_sources_dev(self):
         """Tests issue #30 with load_environ and checking dev sources."""
-        from envstack.env import load_environ
 
         # update default.env to point to test root
         default_env_file = os.path.join(self.root, "prod", "env", "default.env")
+        self.addCleanup(restore_env_file, default_env_file)
         update_env_file(default_env_file, "ROOT", self.root)
 
         # load dev and hello stacks
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2024, Ryan Galloway (ryan@rsgalloway.com)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  - Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#  - Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#  - Neither the name of the software nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__doc__ = """
+Contains unit tests for the path.py module.
+"""
+
+import sys
+import unittest
+from unittest import mock
+
+from envstack.exceptions import InvalidPath, MissingFieldError
+from envstack.path import Template, compile_template, match_template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_get_keywords(self):
+        t = Template("/projects/{show}/{sequence}/{shot}/{show}_{task}")
+        self.assertEqual(t.get_keywords(), ["show", "sequence", "shot", "task"])
+
+    def test_apply_fields(self):
+        t = Template("/show/{show}/pub/{asset}/v{version:03d}")
+        p = t.apply_fields(show="foo", asset="bar", version=3)
+        self.assertEqual(p.path, "/show/foo/pub/bar/v003")
+
+    def test_apply_fields_missing(self):
+        t = Template("/projects/{show}/{shot}")
+        with self.assertRaises(MissingFieldError):
+            t.apply_fields(show="bunny")
+
+    def test_get_formats(self):
+        t = Template("/show/{show}/v{version:03d}/{frame:04d}.{scale:.2f}")
+        formats = t.get_formats()
+        self.assertEqual(
+            formats, {"show": str, "version": int, "frame": int, "scale": float}
+        )
+        formats["show"] = int
+        self.assertIs(t.get_formats()["show"], str)
+
+    def test_get_fields(self):
+        t = Template("/projects/{show}/{sequence}/{shot}/{task}")
+        fields = t.get_fields("/projects/test/xyz/020/lighting")
+        self.assertEqual(
+            fields,
+            {"show": "test", "sequence": "xyz", "shot": "020", "task": "lighting"},
+        )
+
+    def test_get_fields_formats(self):
+        t = Template("/show/{show}/pub/{asset}/v{version:03d}")
+        fields = t.get_fields("/show/foo/pub/bar/v003")
+        self.assertEqual(fields, {"show": "foo", "asset": "bar", "version": 3})
+
+    def test_get_fields_back_reference(self):
+        t = Template("/projects/{show}/{shot}/{show}_{desc}.ext")
+        fields = t.get_fields("/projects/bunny/tst001/bunny_cam.ext")
+        self.assertEqual(fields["show"], "bunny")
+        self.assertEqual(fields["desc"], "cam")
+        with self.assertRaises(InvalidPath):
+            t.get_fields("/projects/bunny/tst001/bigbuck_cam.ext")
+
+    def test_get_fields_windows_slashes(self):
+        t = Template("C:\\projects\\{show}\\{shot}")
+        fields = t.get_fields("C:\\projects\\bunny\\0100")
+        self.assertEqual(fields, {"show": "bunny", "shot": "0100"})
+
+    def test_get_fields_interned_keys(self):
+        t = Template("/projects/{show}/{shot}")
+        keys = list(t.get_fields("/projects/bunny/0100"))
+        self.assertIs(keys[0], sys.intern("show"))
+        self.assertIs(keys[1], sys.intern("shot"))
+
+    def test_slots(self):
+        t = Template("/projects/{show}")
+        self.assertFalse(hasattr(t, "__dict__"))
+        self.assertEqual(str(t), "/projects/{show}")
+        self.assertEqual(repr(t), "<Template '/projects/{show}'>")
+
+    def test_compile_template_cache(self):
+        path_format = "/projects/{show}/{shot}"
+        self.assertIs(compile_template(path_format), compile_template(path_format))
+
+
+class TestMatchTemplate(unittest.TestCase):
+    templates = {
+        "ROOT": "/projects",
+        "SHOWDIR": "/projects/{show}",
+        "SEQDIR": "/projects/{show}/{sequence}",
+        "SHOTDIR": "/projects/{show}/{sequence}/{shot}",
+        "ASSETDIR": "/assets/{show}/{asset}",
+    }
+
+    def setUp(self):
+        patcher = mock.patch(
+            "envstack.path.get_template_environ", return_value=self.templates
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_match_most_specific(self):
+        template = match_template("/projects/bunny/abc/0100")
+        self.assertEqual(template.path_format, self.templates["SHOTDIR"])
+
+    def test_match_other_prefix(self):
+        template = match_template("/assets/bunny/rabbit")
+        self.assertEqual(template.path_format, self.templates["ASSETDIR"])
+
+    def test_match_windows_slashes(self):
+        template = match_template("\\assets\\bunny\\rabbit")
+        self.assertEqual(template.path_format, self.templates["ASSETDIR"])
+
+    def test_no_match(self):
+        self.assertIsNone(match_template("/some/other/path"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -35,67 +35,134 @@ Contains unit tests for the util.py module.
 
 import os
 import unittest
+from types import MappingProxyType
 
 from envstack import config
 from envstack.exceptions import CyclicalReference
-from envstack.util import encode, evaluate_modifiers, get_stack_name, safe_eval
+from envstack.util import (
+    dedupe_list,
+    dedupe_paths,
+    dict_diff,
+    encode,
+    evaluate_modifiers,
+    get_stack_name,
+    safe_eval,
+)
 
 
 class TestEvaluateModifiers(unittest.TestCase):
-    def test_no_substitution(self):
-        expression = "world"
-        result = evaluate_modifiers(expression)
-        self.assertEqual(result, "world")
-
-    def test_direct_substitution(self):
-        expression = "${VAR}"
-        environ = {"VAR": "hello"}
-        result = evaluate_modifiers(expression, environ)
-        self.assertEqual(result, "hello")
-
-    def test_default_value(self):
-        expression = "${VAR:=default}"
-        environ = {"VAR": "hello"}
-        result = evaluate_modifiers(expression, environ)
-        self.assertEqual(result, "hello")
-
-    def test_default_value_empty_env(self):
-        expression = "${VAR:=default}"
-        environ = {}
-        result = evaluate_modifiers(expression, environ)
-        self.assertEqual(result, "default")
+    # read-only environs shared by tests
+    environ = MappingProxyType({"VAR": "hello"})
+    empty_environ = MappingProxyType({})
+
+    # (expression, environ, expected) substitution cases
+    cases = (
+        ("world", empty_environ, "world"),
+        ("/a:/b:/a", empty_environ, os.pathsep.join(["/a", "/b"])),
+        ("${VAR}", environ, "hello"),
+        ("${ENVSTACK_UNSET_VAR}", empty_environ, ""),
+        ("${FOO}", {"FOO": "${BAR}/foo", "BAR": "bar"}, "bar/foo"),
+        ("${FOO}", {"FOO": "/a:/b:/a"}, os.pathsep.join(["/a", "/b"])),
+        ("${VAR:=default}", environ, "hello"),
+        ("${VAR:=default}", empty_environ, "default"),
+        ("${VAR:?error message}", environ, "hello"),
+        (
+            "${VAR}/${FOO:=foobar}/${BAR:?error message}",
+            {"VAR": "hello", "BAR": "world"},
+            "hello/foobar/world",
+        ),
+    )
+
+    def test_substitutions(self):
+        for expression, environ, expected in self.cases:
+            with self.subTest(expression=expression, environ=environ):
+                self.assertEqual(evaluate_modifiers(expression, environ), expected)
 
     def test_default_value_with_default_args(self):
         expression = "${HELLO:=world}"
         result = evaluate_modifiers(expression)
         self.assertEqual(result, os.getenv("HELLO", "world"))
 
-    def test_error_message(self):
-        expression = "${VAR:?error message}"
-        environ = {"VAR": "hello"}
-        result = evaluate_modifiers(expression, environ)
-        self.assertEqual(result, "hello")
-
     def test_error_message_raise(self):
         expression = "${VAR:?error message}"
-        environ = {}
         with self.assertRaises(ValueError):
-            evaluate_modifiers(expression, environ)
-
-    def test_cyclical_reference_error(self):
-        expression = "${VAR}"
-        environ = {"VAR": "${FOO}", "FOO": "${BAR}", "BAR": "${VAR}"}
-        with self.assertRaises(CyclicalReference):
-            evaluate_modifiers(expression, environ)
-
-    def test_multiple_substitutions(self):
-        expression = "${VAR}/${FOO:=foobar}/${BAR:?error message}"
-        environ = {"VAR": "hello", "BAR": "world"}
-        result = evaluate_modifiers(expression, environ)
-        self.assertEqual(result, "hello/foobar/world")
+            evaluate_modifiers(expression, self.empty_environ)
+
+    def test_memo(self):
+        environ = {"ROOT": "/mnt", "PROJ": "${ROOT}/projects"}
+        memo = {}
+        result = evaluate_modifiers("${PROJ}/bunny", environ, memo)
+        self.assertEqual(result, "/mnt/projects/bunny")
+        self.assertEqual(memo["${ROOT}/projects"], "/mnt/projects")
+        self.assertEqual(memo["${PROJ}/bunny"], "/mnt/projects/bunny")
+        # memoized results are returned without re-evaluating
+        memo["${PROJ}/shrek"] = "cached"
+        self.assertEqual(evaluate_modifiers("${PROJ}/shrek", environ, memo), "cached")
+
+    def test_non_string_values(self):
+        environ = self.environ
+        self.assertEqual(evaluate_modifiers(["${VAR}", 1], environ), ["hello", 1])
+        self.assertEqual(evaluate_modifiers({"a": "${VAR}"}, environ), {"a": "hello"})
+        self.assertEqual(evaluate_modifiers(5, environ), 5)
+        self.assertEqual(evaluate_modifiers(4.5, environ), 4.5)
+
+    def test_non_string_nested_values(self):
+        environ = {"ROOT": "/mnt", "DEPLOY_ROOT": "${ROOT}/prod"}
+        self.assertEqual(
+            evaluate_modifiers(["${DEPLOY_ROOT}/lib"], environ), ["/mnt/prod/lib"]
+        )
+        self.assertEqual(
+            evaluate_modifiers({"lib": "${DEPLOY_ROOT}/lib"}, environ),
+            {"lib": "/mnt/prod/lib"},
+        )
+
+
+class TestDedupePaths(unittest.TestCase):
+    # shared path fixtures
+    paths = "/a:/b:/a"
+    deduped = ["/a", "/b"]
+
+    def test_dedupe_paths(self):
+        paths = "/usr/bin:/bin:/usr/bin:/usr/local/bin:/bin"
+        self.assertEqual(dedupe_paths(paths, ":"), "/usr/bin:/bin:/usr/local/bin")
+
+    def test_dedupe_paths_pathsep(self):
+        self.assertEqual(dedupe_paths(self.paths, ";"), ";".join(self.deduped))
+        self.assertEqual(dedupe_paths(self.paths), os.pathsep.join(self.deduped))
+
+    def test_dedupe_paths_platform(self):
+        windows = dedupe_paths(self.paths, platform="windows")
+        self.assertEqual(windows, ";".join(self.deduped))
+        linux = dedupe_paths(self.paths, ";", platform="linux")
+        self.assertEqual(linux, ":".join(self.deduped))
+        other = dedupe_paths(self.paths, ";", platform="other")
+        self.assertEqual(other, ";".join(self.deduped))
+
+    def test_dedupe_paths_single(self):
+        self.assertEqual(dedupe_paths("/usr/bin"), "/usr/bin")
+        self.assertEqual(dedupe_paths(""), "")
+
+    def test_dedupe_paths_empty_entries(self):
+        self.assertEqual(dedupe_paths("/a::/b::/a", ":"), "/a::/b")
 
 
 class TestUtils(unittest.TestCase):
+    def test_dedupe_list(self):
+        self.assertEqual(dedupe_list([]), [])
+        self.assertEqual(dedupe_list(["a", "b", "a", "c", "b"]), ["a", "b", "c"])
+        self.assertEqual(
+            dedupe_list(["/usr/bin", "", "/bin", ""]), ["/usr/bin", "", "/bin"]
+        )
+
+    def test_dict_diff(self):
+        dict1 = {"A": "a", "B": "b", "C": "c"}
+        dict2 = {"A": "a", "B": "x", "D": "d"}
+        diffs = dict_diff(dict1, dict2)
+        self.assertEqual(diffs["added"], {"D": "d"})
+        self.assertEqual(diffs["removed"], {"C": "c"})
+        self.assertEqual(diffs["changed"], {"B": ("b", "x")})
+        self.assertEqual(diffs["unchanged"], {"A": "a"})
+
     def test_encode(self):
         env = {
             "VAR1": "value1",
@@ -110,6 +177,16 @@ class TestUtils(unittest.TestCase):
         }
         self.assertEqual(encoded_env, expected_encoded_env)
 
+    def test_encode_str_subclass(self):
+        class Value(str):
+            pass
+
+        encoded_env = encode({Value("VAR"): Value("value"), "NONE": None})
+        self.assertEqual(encoded_env, {"VAR": "value", "NONE": "None"})
+        for k, v in encoded_env.items():
+            self.assertIs(type(k), str)
+            self.assertIs(type(v), str)
+
     def test_get_stack_name_string(self):
         name = "stack_name"
         result = get_stack_name(name)
@@ -125,6 +202,10 @@ class TestUtils(unittest.TestCase):
         result = get_stack_name(name)
         self.assertEqual(result, "stack_name")
 
+    def test_get_stack_name_path(self):
+        self.assertEqual(get_stack_name("/path/to/stack_name.env"), "stack_name")
+        self.assertEqual(get_stack_name(["a", "/path/to/b.env"]), "b")
+
     def test_get_stack_name_empty(self):
         name = []
         result = get_stack_name(name)
@@ -167,6 +248,20 @@ class TestSafeEval(unittest.TestCase):
         result = safe_eval(value)
         self.assertEqual(result, "invalid")
 
+    def test_safe_eval_literals(self):
+        self.assertEqual(safe_eval("0"), 0)
+        self.assertEqual(safe_eval("-5"), -5)
+        self.assertEqual(safe_eval("1."), 1.0)
+        self.assertEqual(safe_eval(".5"), 0.5)
+        self.assertEqual(safe_eval("1e3"), 1000.0)
+        self.assertIs(safe_eval("True"), True)
+        self.assertIsNone(safe_eval("None"))
+        self.assertEqual(safe_eval("0123"), "0123")
+        self.assertEqual(safe_eval("if"), "if")
+        self.assertEqual(safe_eval("/usr/bin"), "/usr/bin")
+        self.assertEqual(safe_eval("${ROOT}/bin"), "${ROOT}/bin")
+        self.assertEqual(safe_eval("~/.local"), "~/.local")
+
 
 class TestIssue18(unittest.TestCase):
     def test_non_cyclical_reference_error_1(self):
@@ -184,6 +279,11 @@ class TestIssue18(unittest.TestCase):
         environ = {"FOO": "bar/${FOO}"}
         self.assertEqual(evaluate_modifiers(expression, environ), "bar/")
 
+    def test_non_cyclical_reference_error_4(self):
+        expression = "${FOO}/${BAR}"
+        environ = {"FOO": "${BAR}/${BAR}", "BAR": "${BAZ}", "BAZ": "baz"}
+        self.assertEqual(evaluate_modifiers(expression, environ), "baz/baz/baz")
+
     def test_cyclical_reference_error_1(self):
         expression = "${VAR}"
         environ = {"VAR": "${FOO}", "FOO": "${BAR}", "BAR": "${VAR}"}
@@ -196,6 +296,14 @@ class TestIssue18(unittest.TestCase):
         with self.assertRaises(CyclicalReference):
             evaluate_modifiers(expression, environ)
 
+    def test_cyclical_reference_error_3(self):
+        expression = "${FOO}"
+        environ = {"FOO": "${BAR}", "BAR": "${FOO}"}
+        with self.assertRaises(CyclicalReference) as ctx:
+            evaluate_modifiers(expression, environ)
+        # detected before exhausting the recursion limit
+        self.assertNotIsInstance(ctx.exception.__context__, RecursionError)
+
 
 if __name__ == "__main__":
     unittest.main()